@@ -0,0 +1,62 @@
+import threading
+from queue import Queue, Empty
+
+from constants import MINIMAX_DEPTH
+from solver import Solver
+from stats import SearchStats, SearchCancelled
+
+
+class SolveTask:
+    # runs one solve on a copy of the puzzle in a worker thread and hands its moves back through a queue;
+    # on_finished is called from that thread once the search is over
+    def __init__(self, puzzle, mode, time_limit=None, on_finished=None):
+        self.mode = mode
+        self.time_limit = time_limit
+        self.on_finished = on_finished
+        self.cancelled = threading.Event()
+        self.stats = SearchStats(cancel=self.cancelled)
+        self.solver = Solver(puzzle.copy(), self.stats)
+        self.moves = Queue()
+        self.finished = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            if self.mode in ("minimax", "iterative_deepening"):
+                # the game-playing modes hand over every move as soon as it is chosen
+                iterative = self.mode == "iterative_deepening"
+                for move in self.solver.play_minimax(MINIMAX_DEPTH, iterative):
+                    self.moves.put(move)
+            else:
+                for move in self.solver.solve(self.mode, time_limit=self.time_limit) or []:
+                    self.moves.put(move)
+        except SearchCancelled:
+            pass
+        except Exception as error:
+            self.error = error
+        finally:
+            self.finished.set()
+            if self.on_finished is not None:
+                self.on_finished()
+
+    def next_move(self):
+        try:
+            return self.moves.get_nowait()
+        except Empty:
+            return None
+
+    def done(self):
+        # finished and every move already handed over
+        return self.finished.is_set() and self.moves.empty()
+
+    def progress(self):
+        return self.stats.expanded, self.stats.bound
+
+    def cancel(self):
+        self.cancelled.set()
+        self.thread.join()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+from benchmark import ALGORITHMS
+from constants import ANYTIME_TIME_LIMIT
+from levels import load_levels, to_puzzle
+from solver import Solver
+from stats import SearchStats, SearchCancelled
+
+
+def solve_level(index, level, algorithm, timeout, canonical=False, budget=None):
+    # runs in a pool worker: the timeout cancels the search through its stats, so the worker stays reusable
+    cancelled = threading.Event()
+    timer = threading.Timer(timeout, cancelled.set) if timeout else None
+    stats = SearchStats(cancel=cancelled)
+    result = {"index": index, "name": level.get("name"), "algorithm": algorithm}
+    start = time.perf_counter()
+    if timer is not None:
+        timer.start()
+    solver = None
+    try:
+        puzzle = to_puzzle(level)
+        solver = Solver(puzzle, stats, canonical=canonical)
+        moves = solver.solve(algorithm, time_limit=budget)
+        status = "solved"
+    except SearchCancelled:
+        moves = None
+        status = "timeout"
+    except Exception as error:
+        moves = None
+        status = "error"
+        result["error"] = repr(error)
+    finally:
+        if timer is not None:
+            timer.cancel()
+    result["time"] = time.perf_counter() - start
+    result["nodes"] = stats.expanded
+
+    if status == "solved":
+        replay = puzzle.copy()
+        if moves is None or not all(replay.make_move(move) for move in moves) or not replay.win_condition():
+            status = "failed"
+    result["status"] = status
+    result["cost"] = len(moves) if status == "solved" else None
+    result["solution"] = [list(move) for move in moves] if status == "solved" else None
+    if solver is not None and solver.optimal is not None:
+        result["optimal"] = solver.optimal
+    return result
+
+
+def solve_levels(levels, algorithm, timeout, workers, canonical=False, budget=None):
+    # keeps a bounded number of levels in flight, so huge inputs are streamed rather than read up front
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        for index, level in enumerate(levels):
+            if "error" in level:
+                # a line that could not be read is reported on its own and the rest of the run goes on
+                yield {"index": index, "line": level["line"], "status": "error", "error": level["error"]}
+                continue
+            pending.add(executor.submit(solve_level, index, level, algorithm, timeout, canonical, budget))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many levels in parallel and print one JSON result per line.")
+    parser.add_argument("levels", nargs="?", default="-", help="level file, '-' (the default) for stdin")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="a_star")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per level, 0 for no limit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--canonical", action="store_true", help="merge symmetric states during the search")
+    parser.add_argument("--budget", type=float, help="seconds the anytime algorithm searches per level (default %s)"
+                        % ANYTIME_TIME_LIMIT)
+    args = parser.parse_args(argv)
+
+    levels = load_levels(args.levels, strict=False)
+    for result in solve_levels(levels, args.algorithm, args.timeout, args.workers, args.canonical, args.budget):
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
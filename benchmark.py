@@ -0,0 +1,152 @@
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import time
+
+from constants import PIECE_COLORS
+from levels import load_levels
+from piece import Piece
+from puzzle import Puzzle
+from solver import Solver
+
+ALGORITHMS = ["bfs", "parallel_bfs", "bidirectional", "a_star", "anytime", "ida_star", "greedy", "minimax", "iterative_deepening"]
+
+# (board size, number of colors, pieces per color) of every puzzle set in the default corpus
+CORPUS = [
+    (4, 2, 2), (4, 3, 3),
+    (5, 3, 2), (5, 3, 3),
+    (6, 3, 3), (6, 4, 3),
+    (7, 4, 3), (7, 5, 3),
+    (8, 5, 3), (8, 6, 3),
+]
+
+
+def random_pieces(size, colors, per_color, rng):
+    # same rules as the default layout: one piece per cell and nothing joined at the start
+    cells = [(row, col) for row in range(size) for col in range(size)]
+    while True:
+        chosen = rng.sample(cells, colors * per_color)
+        pieces = [Piece(PIECE_COLORS[i // per_color], row, col) for i, (row, col) in enumerate(chosen)]
+        if Puzzle(size, size, pieces).unjoined == len(pieces):
+            return [(piece.color, piece.row, piece.col) for piece in pieces]
+
+
+def generate_corpus(seed, count, corpus=CORPUS):
+    rng = random.Random(seed)
+    puzzles = []
+    for size, colors, per_color in corpus:
+        for index in range(count):
+            puzzles.append({
+                "name": "%dx%d-c%d-p%d-%d" % (size, size, colors, per_color, index),
+                "width": size,
+                "height": size,
+                "pieces": random_pieces(size, colors, per_color, rng),
+            })
+    return puzzles
+
+
+def run_solver(algorithm, width, height, pieces, sender, canonical=False):
+    puzzle = Puzzle(width, height, [Piece(tuple(color), row, col) for color, row, col in pieces])
+    solver = Solver(puzzle, canonical=canonical)
+    start = time.perf_counter()
+    try:
+        moves = solver.solve(algorithm)
+    except Exception as error:
+        sender.send({"status": "error", "error": repr(error)})
+        return
+    elapsed = time.perf_counter() - start
+
+    solved = moves is not None
+    if solved:
+        replay = puzzle.copy()
+        solved = all(replay.make_move(move) for move in moves) and replay.win_condition()
+
+    sender.send({
+        "status": "solved" if solved else "failed",
+        "time": elapsed,
+        "nodes": solver.stats.expanded,
+        "solution_length": len(moves) if solved else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        # the largest worker process the solver started, e.g. a parallel_bfs shard
+        "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "stats": solver.stats.as_dict(),
+    })
+
+
+def benchmark(puzzles, algorithms, timeout, canonical=False):
+    # every run gets a fresh interpreter so peak memory and timeouts are measured per solve
+    context = multiprocessing.get_context("spawn")
+    for puzzle in puzzles:
+        for algorithm in algorithms:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_solver, args=(algorithm, puzzle["width"], puzzle["height"], puzzle["pieces"], sender, canonical))
+            process.start()
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+                result = {"status": "timeout", "time": timeout}
+            elif receiver.poll():
+                result = receiver.recv()
+            else:
+                result = {"status": "error", "error": "exit code %s" % process.exitcode}
+
+            result["puzzle"] = puzzle["name"]
+            result["algorithm"] = algorithm
+            if result.get("nodes") and result.get("time"):
+                result["nodes_per_sec"] = result["nodes"] / result["time"]
+            yield result
+
+
+def format_row(result):
+    def show(key, pattern):
+        value = result.get(key)
+        return "-" if value is None else pattern % value
+
+    return "%-18s %-20s %-8s %9s %10s %12s %10s %10s %8s" % (
+        result["puzzle"], result["algorithm"], result["status"],
+        show("time", "%.3f"), show("nodes", "%d"), show("nodes_per_sec", "%.0f"),
+        show("peak_rss_kb", "%d"), show("children_peak_rss_kb", "%d"), show("solution_length", "%d"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every solver over a seeded puzzle corpus.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=2, help="puzzles generated per corpus entry")
+    parser.add_argument("--max-size", type=int, default=8)
+    parser.add_argument("--levels", help="benchmark the levels in this file ('-' for stdin) instead of the seeded corpus")
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds allowed per solve")
+    parser.add_argument("--canonical", action="store_true", help="merge symmetric states during the search")
+    parser.add_argument("--json", help="also write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    if args.levels:
+        puzzles = list(load_levels(args.levels))
+    else:
+        corpus = [entry for entry in CORPUS if entry[0] <= args.max_size]
+        puzzles = generate_corpus(args.seed, args.count, corpus)
+
+    table = sys.stderr if args.json == "-" else sys.stdout
+    print("%-18s %-20s %-8s %9s %10s %12s %10s %10s %8s" % (
+        "puzzle", "algorithm", "status", "time (s)", "nodes", "nodes/s", "rss (kB)", "child (kB)", "length"), file=table)
+    results = []
+    for result in benchmark(puzzles, args.algorithms, args.timeout, args.canonical):
+        print(format_row(result), file=table, flush=True)
+        results.append(result)
+
+    if args.json:
+        report = {"seed": args.seed, "count": args.count, "timeout": args.timeout, "canonical": args.canonical,
+                  "results": results}
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+        else:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
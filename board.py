@@ -1,12 +1,16 @@
 import sys
-import random
+from collections import deque
+
 import pygame
 
 from constants import *
 from tile import Tile
-from piece import Piece
-from solver import Solver
-from copy import deepcopy
+from puzzle import Puzzle
+from background import SolveTask
+from solution_cache import get_solution_cache
+
+# posted by the hint search when its answer is ready, so the event loop wakes up for it
+HINT_READY = pygame.event.custom_type()
 
 
 class Board:
@@ -15,132 +19,115 @@ class Board:
         self.height = height
         self.screen = screen
         self.mode = mode
+        self.puzzle = Puzzle(width, height)
         self.tiles = [[Tile(row, col) for col in range(width)] for row in range(height)]
         self.selected_tile = None
-        self.pieces = self.create_pieces()
         self.piece_selected = False
-        self.moves = 0
-        self.all_moves = []
-
-    def create_pieces(self):
-        pieces = [
-            Piece(BLUE, 0, 0),
-            Piece(BLUE, 1, 1),
-            Piece(BLUE, 2, 2),
-            Piece(GREEN, 3, 3),
-            Piece(GREEN, 1, 3),
-            Piece(GREEN, 0, 2),
-            Piece(RED, 0, 3),
-            Piece(RED, 1, 2),
-            Piece(RED, 3, 0)
-        ]
-        for piece in pieces:
-            self.tiles[piece.row][piece.col].has_piece = True
-        return pieces
-
+        self.highlighted = set()
+        self.dirty = set()
+        self.selections = []
+        self.cache = get_solution_cache()
+        # set when escape stopped the last solver run
+        self.cancelled = False
+        # the hint search in progress, with the position it was asked for
+        self.hint = None
+        self.hint_hash = None
+
+    def highlights(self):
+        if self.piece_selected and self.selected_tile is not None:
+            return set(self.get_possible_moves())
+        return set()
 
     def draw(self, surface):
+        # full redraw, used for the first frame and after anything else has drawn over the window
         surface.fill(BLACK)
+        self.highlighted = self.highlights()
         for row in range(self.height):
             for col in range(self.width):
-                self.tiles[row][col].draw(surface)
-                if self.tiles[row][col].has_piece:
-                    piece = next((piece for piece in self.pieces if piece.row == row and piece.col == col), None)
-                    if piece:
-                        piece.draw(surface)
-
-                        if self.piece_selected and self.selected_tile is not None:
-                            possible_moves = self.get_possible_moves()
-                            if (piece.row, piece.col) == (self.selected_tile.row, self.selected_tile.col):
-                                for move in possible_moves:
-                                    x = move[0]
-                                    y = move[1]
-                                    self.tiles[x][y].color = YELLOW
-                                    self.tiles[x][y].draw(surface)
+                self.tiles[row][col].draw(surface, self.puzzle.piece_at(row, col), (row, col) in self.highlighted)
+        self.dirty.clear()
+
+    def render(self, surface):
+        # redraws only the cells that changed since the last frame and returns their rects for display.update
+        highlighted = self.highlights()
+        self.dirty |= highlighted ^ self.highlighted
+        self.highlighted = highlighted
+        rects = [self.tiles[row][col].draw(surface, self.puzzle.piece_at(row, col), (row, col) in highlighted)
+                 for row, col in self.dirty]
+        self.dirty.clear()
+        return rects
+
+    def mark_move(self, move):
+        self.dirty.add((move[0], move[1]))
+        self.dirty.add((move[2], move[3]))
 
     def handle_event(self, event):
-        self.check_joined_pieces()
         if event.type == pygame.MOUSEBUTTONDOWN:
             row, col = event.pos[1] // CELL_SIZE, event.pos[0] // CELL_SIZE
             if self.selected_tile is None:
-                if self.tiles[row][col].has_piece:
+                if self.puzzle.has_piece(row, col):
                     self.selected_tile = self.tiles[row][col]
                     self.piece_selected = True
             else:
                 if self.selected_tile.row == row and self.selected_tile.col == col:
                     self.selected_tile = None
                     self.piece_selected = False
-                elif not self.tiles[row][col].has_piece:
-                    piece = next((piece for piece in self.pieces if
-                                  piece.row == self.selected_tile.row and piece.col == self.selected_tile.col), None)
-                    if piece and self.can_move_piece(piece, row, col):
-                        piece.row, piece.col = row, col
-                        self.tiles[row][col].has_piece = True
-                        self.tiles[self.selected_tile.row][self.selected_tile.col].has_piece = False
+                elif not self.puzzle.has_piece(row, col):
+                    if self.make_move((self.selected_tile.row, self.selected_tile.col, row, col)):
                         self.piece_selected = False
-                        self.moves += 1
-                        self.all_moves.append((self.selected_tile.row, self.selected_tile.col, row, col))
                     self.selected_tile = None
                 self.selected_tile = None
-
-        for x in self.tiles:
-            for possible_tile in x:
-                if possible_tile.color == YELLOW:
-                    possible_tile.color = CREAM
-
-    def can_move_piece(self, piece, row, col):
-        if piece.joined:
-            return False
-        if (abs(row - piece.row) == 1 and col == piece.col) or (abs(col - piece.col) == 1 and row == piece.row):
-            if not self.tiles[row][col].has_piece:
-                return True
-        return False
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
+            self.undo_move()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+            self.show_hint()
+        elif event.type == HINT_READY:
+            self.finish_hint()
+
+    def show_hint(self):
+        # looks for the piece to move next in a worker thread, from the best solution found within a short, fixed time
+        if self.hint is not None:
+            return
+        self.hint_hash = self.puzzle.hash
+        self.hint = SolveTask(self.puzzle, "anytime", HINT_TIME_LIMIT,
+                              lambda: pygame.event.post(pygame.event.Event(HINT_READY))).start()
+
+    def finish_hint(self):
+        # selects the hinted piece, unless the board changed while the hint was being searched
+        task = self.hint
+        if task is None or not task.finished.is_set():
+            return
+        self.hint = None
+        move = task.next_move()
+        if move is not None and self.puzzle.hash == self.hint_hash:
+            self.selected_tile = self.tiles[move[0]][move[1]]
+            self.piece_selected = True
 
     def get_possible_moves(self):
         if self.selected_tile is None:
             return []
 
-        possible_moves = []
-        piece = next((piece for piece in self.pieces if
-                      piece.row == self.selected_tile.row and piece.col == self.selected_tile.col), None)
+        piece = self.puzzle.piece_at(self.selected_tile.row, self.selected_tile.col)
 
         if piece is None:
             return []
 
-        for row in range(self.height):
-            for col in range(self.width):
-                if not self.tiles[row][col].has_piece and self.can_move_piece(piece, row, col):
-                    possible_moves.append((row, col))
-
-        return possible_moves
-
-    def check_joined_pieces(self):
-        for piece1 in self.pieces:
-            for piece2 in self.pieces:
-                if piece1 != piece2 and piece1.color == piece2.color:
-                    if (piece1.row == piece2.row and abs(piece1.col - piece2.col) == 1) or \
-                            (piece1.col == piece2.col and abs(piece1.row - piece2.row) == 1):
-                        piece1.joined = True
-                        piece2.joined = True
-
-    def win_condition(self):
-        joined_pieces = [piece for piece in self.pieces if piece.joined]
-        if len(joined_pieces) == len(self.pieces):
-            return True
-        return False
+        return self.puzzle.get_possible_moves(piece)
 
     def draw_win_screen(self):
         self.screen.fill((0, 0, 0))
         font_path = "fonts/Grand9K Pixel.ttf"
         font = pygame.font.Font(font_path, 40)
         title = font.render('You Won!', True, (255, 255, 255))
-        moves_button = font.render('Moves = ' + str(self.moves), True, (255, 255, 255))
+        moves_button = font.render('Moves = ' + str(self.puzzle.moves), True, (255, 255, 255))
         self.screen.blit(title, (SCREEN_WIDTH / 2 - title.get_width() / 2, SCREEN_WIDTH / 2 - title.get_height() / 3 - 40))
         self.screen.blit(moves_button, (SCREEN_WIDTH / 2 - moves_button.get_width() / 2, SCREEN_HEIGHT / 1.9 + moves_button.get_height() - 30))
         pygame.display.update()
 
     def run(self):
         mode = self.mode
+        self.draw(self.screen)
+        pygame.display.flip()
         if mode == "minimax":
             self.run_minimax()
         elif mode == "bfs":
@@ -151,175 +138,153 @@ class Board:
             self.run_greedy()
         elif mode == "iterative_deepening":
             self.run_iterative_deepening()
+        elif mode == "ida_star":
+            self.run_ida_star()
+        elif mode == "anytime":
+            self.run_anytime()
 
         else:
             while True:
-                if self.win_condition():
+                if self.puzzle.win_condition():
                     self.draw_win_screen()
                     pygame.time.delay((3 * 1000))
                     pygame.quit()
                     sys.exit()
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    else:
-                        self.handle_event(event)
-
-                self.draw(self.screen)
+                # sleep until something happens instead of redrawing the whole board every iteration
+                event = pygame.event.wait()
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.draw(self.screen)
+                    pygame.display.flip()
+                else:
+                    self.handle_event(event)
 
-                pygame.display.flip()
+                rects = self.render(self.screen)
+                if rects:
+                    pygame.display.update(rects)
 
     def make_move(self, move):
-        if self.selected_tile is None:
-            return False
-        self.selected_tile = self.tiles[move[0]][move[1]]
-        piece = next((piece for piece in self.pieces if
-            piece.row == self.selected_tile.row and piece.col == self.selected_tile.col), None)
-
-
-        if piece is None:
+        selection = (self.selected_tile, self.piece_selected)
+        if not self.puzzle.make_move(move):
             return False
+        self.selections.append(selection)
+        self.mark_move(move)
+        self.selected_tile = self.tiles[move[2]][move[3]]
+        return True
 
-        if not self.can_move_piece(piece, move[0], move[1]):
+    def undo_move(self):
+        # takes back the last move and puts the selection back the way it was before it
+        move = self.puzzle.undo_move()
+        if move is None:
             return False
-
-        self.tiles[piece.row][piece.col].has_piece = False
-        self.all_moves.append((self.selected_tile.row, self.selected_tile.col, move[0], move[1]))
-        piece.row = move[0]
-        piece.col = move[1]
-        self.tiles[piece.row][piece.col].has_piece = True
-
-        self.selected_tile = self.tiles[piece.row][piece.col]
+        self.mark_move(move)
+        self.selected_tile, self.piece_selected = self.selections.pop()
         return True
 
+    def quit(self):
+        pygame.time.delay((3 * 1000))
+        pygame.quit()
+        sys.exit()
+
+    def run_solver(self, mode):
+        # the search runs in a worker thread while this loop keeps the window responsive,
+        # shows its progress and animates the moves as they arrive; escape cancels it
+        start = self.puzzle.copy()
+        pending = deque()
+        task = None
+        self.cancelled = False
+        cached = self.cache.get(self.puzzle, mode)
+        if cached is not None:
+            pending.extend(cached)
+        else:
+            task = SolveTask(self.puzzle, mode).start()
 
-    def undo_move(self):
-        if len(self.all_moves) == 0:
-            return
-        last_move = self.all_moves.pop()
-        from_row, from_col, to_row, to_col = last_move
-        piece = next((piece for piece in self.pieces if piece.row == to_row and piece.col == to_col), None)
-        if piece:
-            piece.row, piece.col = from_row, from_col
-            self.tiles[from_row][from_col].has_piece = True
-            self.tiles[to_row][to_col].has_piece = False
-            self.moves -= 1
-            self.check_joined_pieces()
-
-    
-    def get_first_tile(self):
-        for row in range(self.height):
-            for col in range(self.width):
-                if self.tiles[row][col].has_piece:
-                    piece = next((piece for piece in self.pieces if piece.row == row and piece.col == col), None)
-                    if piece and not piece.joined:
-                        return self.tiles[row][col]
-        return None
-
-                
-    def get_last_move(self):
-        if len(self.all_moves) == 0:
-            return None
-        return self.all_moves[-1][0], self.all_moves[-1][1]
-    
-    #Make a function that copies the board and returns it
-    def copy(self):
-        copy = Board(self.width, self.height, self.screen, self.mode)
-        copy.tiles = deepcopy(self.tiles)
-        copy.pieces = deepcopy(self.pieces)
-        copy.piece_selected = deepcopy(self.piece_selected)
-        copy.selected_tile = deepcopy(self.selected_tile)
-        copy.moves = deepcopy(self.moves)
-        copy.all_moves = deepcopy(self.all_moves)
-        return copy
-
-    def run_minimax(self):
-        self.selected_tile = self.get_first_tile()
-        solver = Solver(self)
+        clock = pygame.time.Clock()
+        played = []
+        next_move_at = 0
         while True:
-            self.selected_tile = self.get_first_tile()
-            
-            if self.win_condition():
-                self.draw_win_screen()
-                pygame.time.delay((3 * 1000))
-                pygame.quit()
-                sys.exit()
-
-            move, _ = solver.minimax(5, True) # get the best move from minimax with depth 5
-            if move is None:
-                pygame.time.delay((3 * 1000))
-                pygame.quit()
-                sys.exit()
-            self.make_move(move) # make the best move
-            self.draw(self.screen) # draw the board after each move
-            pygame.display.flip() # update the screen
-            pygame.time.delay(500) # add a small delay between each move
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    if task is not None:
+                        task.cancel()
+                    pygame.quit()
+                    sys.exit()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    if task is not None:
+                        task.cancel()
+                    self.cancelled = True
+                    return played
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.draw(self.screen)
+                    pygame.display.flip()
+
+            if task is not None:
+                move = task.next_move()
+                while move is not None:
+                    pending.append(move)
+                    move = task.next_move()
+                if not task.finished.is_set():
+                    nodes, bound = task.progress()
+                    pygame.display.set_caption("%s: %d nodes expanded, bound %d" % (mode, nodes, bound))
+
+            now = pygame.time.get_ticks()
+            if now >= next_move_at:
+                if pending:
+                    move = pending.popleft()
+                    self.make_move(move)
+                    played.append(move)
+                    pygame.display.update(self.render(self.screen))
+                    next_move_at = now + MOVE_DELAY
+                elif task is None or task.done():
+                    break
+            clock.tick(FRAME_RATE)
+
+        if task is not None and task.error is not None:
+            raise task.error
+        if not self.puzzle.win_condition():
+            return played or None
+        if task is not None:
+            self.cache.put(start, mode, played)
+        pygame.display.set_caption("%s: solved in %d moves" % (mode, len(played)))
+        return played
 
-    def run_bfs(self):
-        self.selected_tile = self.get_first_tile()
-        solver = Solver(self)
+    def run_minimax(self):
+        self.run_solver("minimax") # moves are animated as soon as minimax picks them
+        if self.cancelled and not self.puzzle.win_condition():
+            return  # back to the menu
 
-        best_path, nodes_explored = solver.bfs(self)  # get the best move from bfs with depth 5
+        if self.puzzle.win_condition():
+            self.draw_win_screen()
+        self.quit()
 
+    def run_bfs(self):
+        best_path = self.run_solver("bfs")  # animate the shortest solution from bfs
         if best_path is None:
-            pygame.time.delay((3 * 1000))
-            pygame.quit()
-            sys.exit()
-        else:
-            for move in best_path:
-                self.make_move(move)
-                self.draw(self.screen)
-                pygame.display.flip()
-                pygame.time.delay(500)
-
+            self.quit()
 
     def run_greedy(self):
-        self.selected_tile = self.get_first_tile()
-        aux = self.copy()
-        solver = Solver(aux)
-        
-        moves = solver.greedy(aux) # get the best move using the greedy algorithm
+        moves = self.run_solver("greedy") # animate the moves chosen by the greedy algorithm
         if moves is None:
-            pygame.time.delay((3 * 1000))
-            pygame.quit()
-            sys.exit()
-        
-        else:
-            for move in moves:
-                self.make_move(move)
-                self.draw(self.screen)
-                pygame.display.flip()
-                pygame.time.delay(500)
+            self.quit()
 
     def run_iterative_deepening(self):
-        self.selected_tile = self.get_first_tile()
-        aux = self.copy()
-        solver = Solver(aux)
-        moves = solver.iterative_deepening(aux)
+        moves = self.run_solver("iterative_deepening")
         if moves is None:
-            pygame.time.delay((3 * 1000))
-            pygame.quit()
-            sys.exit()
-        else:
-            for move in moves:
-                self.make_move(move)
-                self.draw(self.screen)
-                pygame.display.flip()
-                pygame.time.delay(500)
+            self.quit()
 
     def run_astar(self):
-        self.selected_tile = self.get_first_tile()
-        aux = self.copy()
-        solver = Solver(aux)
-        moves = solver.a_star(aux)
+        moves = self.run_solver("a_star")
         if moves is None:
-            pygame.time.delay((3 * 1000))
-            pygame.quit()
-            sys.exit()
-        else:
-            for move in moves:
-                self.make_move(move)
-                self.draw(self.screen)
-                pygame.display.flip()
-                pygame.time.delay(500)
\ No newline at end of file
+            self.quit()
+
+    def run_ida_star(self):
+        moves = self.run_solver("ida_star")
+        if moves is None:
+            self.quit()
+
+    def run_anytime(self):
+        moves = self.run_solver("anytime") # best solution found within ANYTIME_TIME_LIMIT seconds
+        if moves is None:
+            self.quit()
@@ -3,6 +3,16 @@ SCREEN_HEIGHT = 400
 CELL_SIZE = 100
 TILE_SIZE = 100
 
+FRAME_RATE = 30
+MOVE_DELAY = 500
+
+MINIMAX_DEPTH = 7
+IDA_STAR_CACHE_SIZE = 1 << 14
+BIDIRECTIONAL_GOAL_LIMIT = 1 << 18
+ANYTIME_TIME_LIMIT = 2.0
+ANYTIME_WEIGHTS = (5, 3, 2, 1.5, 1.25, 1)
+HINT_TIME_LIMIT = 0.5
+
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -10,3 +20,8 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
 CREAM = (254, 251, 234)
+ORANGE = (255, 128, 0)
+PURPLE = (128, 0, 255)
+CYAN = (0, 255, 255)
+
+PIECE_COLORS = [BLUE, GREEN, RED, ORANGE, PURPLE, CYAN]
@@ -0,0 +1,74 @@
+CACHE_LIMIT = 1 << 16
+
+
+class DeadlockDetector:
+    # joined pieces never move again, so they split the board into regions the other pieces can never leave.
+    # an unjoined piece can only still be joined if its region touches a joined piece of its color or holds
+    # another unjoined piece of its color; a state where that fails for any piece can never be solved
+    def __init__(self, grid):
+        self.grid = grid
+        self.regions = {}
+        self.checks = 0
+        self.dead = 0
+
+    def traps(self, frozen):
+        # for one frozen configuration, per color the free regions with no cell next to a frozen piece of that color
+        key = tuple(frozen)
+        traps = self.regions.get(key)
+        if traps is None:
+            grid = self.grid
+            walls = 0
+            for mask in frozen:
+                walls |= mask
+            free = grid.full_mask & ~walls
+            components = []
+            remaining = free
+            while remaining:
+                component = remaining & -remaining
+                while True:
+                    grown = (component | grid.neighbours(component)) & free
+                    if grown == component:
+                        break
+                    component = grown
+                components.append(component)
+                remaining &= ~component
+            traps = []
+            for mask in frozen:
+                targets = grid.neighbours(mask) & free
+                traps.append([component for component in components if not component & targets])
+            if len(self.regions) >= CACHE_LIMIT:
+                self.regions.clear()
+            self.regions[key] = traps
+        return traps
+
+    def joins(self, masks, move):
+        # whether the piece that just moved touches its own color: the only way the frozen pieces change,
+        # so a child of a live state can only be dead after such a move
+        dst = move[2] * self.grid.width + move[3]
+        for mask in masks:
+            if mask >> dst & 1:
+                return bool(self.grid.neighbour_masks[dst] & mask)
+        return False
+
+    def joins_packed(self, bits, move):
+        # joins() on a packed state, without splitting it into color masks first
+        grid = self.grid
+        dst = move[2] * grid.width + move[3]
+        for offset in range(0, len(grid.colors) * grid.cells, grid.cells):
+            if bits >> (offset + dst) & 1:
+                return bool(grid.neighbour_masks[dst] & bits >> offset)
+        return False
+
+    def is_dead(self, masks):
+        self.checks += 1
+        grid = self.grid
+        unjoined = [mask & ~grid.neighbours(mask) for mask in masks]
+        frozen = [mask & ~loose for mask, loose in zip(masks, unjoined)]
+        for loose, traps in zip(unjoined, self.traps(frozen)):
+            for component in traps:
+                # alone in a region it can never leave, with nothing of its color to reach
+                inside = loose & component
+                if inside and inside & (inside - 1) == 0:
+                    self.dead += 1
+                    return True
+        return False
@@ -0,0 +1,172 @@
+import argparse
+import json
+import random
+import sys
+
+from constants import PIECE_COLORS
+from piece import Piece
+from puzzle import Puzzle
+from state import get_grid, iter_bits
+
+# one letter per entry of PIECE_COLORS, '.' is an empty cell
+COLOR_LETTERS = "BGROPC"
+EMPTY = "."
+# boards drawn before giving up on finding an unsolved one
+GENERATE_ATTEMPTS = 1000
+
+
+def encode(name, width, height, pieces, **extra):
+    # a level is one JSON object per line, with the board drawn as one string per row
+    rows = [[EMPTY] * width for _ in range(height)]
+    for color, row, col in pieces:
+        rows[row][col] = COLOR_LETTERS[PIECE_COLORS.index(tuple(color))]
+    level = {"name": name, "rows": ["".join(row) for row in rows]}
+    level.update(extra)
+    return json.dumps(level)
+
+
+def decode(line):
+    level = json.loads(line)
+    rows = level["rows"]
+    level["height"] = len(rows)
+    level["width"] = len(rows[0])
+    pieces = []
+    for row, cells in enumerate(rows):
+        if len(cells) != level["width"]:
+            raise ValueError("row %d of level %s has %d cells, expected %d" % (row, level["name"], len(cells), level["width"]))
+        for col, letter in enumerate(cells):
+            if letter == EMPTY:
+                continue
+            if letter not in COLOR_LETTERS:
+                raise ValueError("unknown color %r in level %s" % (letter, level["name"]))
+            pieces.append((PIECE_COLORS[COLOR_LETTERS.index(letter)], row, col))
+    level["pieces"] = pieces
+    return level
+
+
+def read_levels(file, strict=True):
+    # streams levels from an open file, skipping blank lines and '#' comments; unless strict,
+    # a malformed line is yielded as {"line": number, "error": message} instead of ending the stream
+    for number, line in enumerate(file, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield decode(line)
+        except (ValueError, KeyError, IndexError, TypeError) as error:
+            if strict:
+                raise ValueError("line %d: %s" % (number, error))
+            yield {"line": number, "error": "%s: %s" % (type(error).__name__, error)}
+
+
+def load_levels(path, strict=True):
+    if path == "-":
+        yield from read_levels(sys.stdin, strict)
+    else:
+        with open(path) as file:
+            yield from read_levels(file, strict)
+
+
+def to_puzzle(level):
+    return Puzzle(level["width"], level["height"], [Piece(color, row, col) for color, row, col in level["pieces"]])
+
+
+def solved_masks(grid, colors, per_color, rng):
+    # every color grown as one connected cluster, so all of its pieces start joined; None when a cluster got boxed in
+    occupied = 0
+    masks = []
+    for _ in range(colors):
+        free = [cell for cell in range(grid.cells) if not occupied >> cell & 1]
+        mask = 1 << rng.choice(free)
+        while mask.bit_count() < per_color:
+            frontier = list(iter_bits(grid.neighbours(mask) & ~mask & ~occupied))
+            if not frontier:
+                return None
+            mask |= 1 << rng.choice(frontier)
+        occupied |= mask
+        masks.append(mask)
+    return masks
+
+
+def scramble(grid, masks, steps, rng):
+    # walks backwards from the solved placement: a piece may be moved back to an empty cell only if it would be
+    # unjoined there, which is exactly when the forward move is legal, so the walk reversed is always a solution
+    masks = list(masks)
+    last = None
+    for _ in range(steps):
+        occupied = 0
+        for mask in masks:
+            occupied |= mask
+        choices = []
+        for color, mask in enumerate(masks):
+            for dst in iter_bits(mask):
+                for src in iter_bits(grid.neighbour_masks[dst] & ~occupied):
+                    if (color, src, dst) != last and not grid.neighbour_masks[src] & (mask ^ (1 << dst)):
+                        choices.append((color, dst, src))
+        if not choices:
+            break
+        color, dst, src = rng.choice(choices)
+        masks[color] ^= (1 << dst) | (1 << src)
+        last = (color, dst, src)
+    return masks
+
+
+def generate(width, height, colors, per_color, difficulty, rng):
+    # difficulty is the number of scrambling moves, an upper bound on the length of the shortest solution
+    if per_color < 2:
+        raise ValueError("a color needs at least two pieces to be joined")
+    if colors > len(PIECE_COLORS):
+        raise ValueError("at most %d colors are supported" % len(PIECE_COLORS))
+    if colors < 1:
+        raise ValueError("a level needs at least one color")
+    if difficulty < 1:
+        raise ValueError("difficulty must be at least one move")
+    if colors * per_color >= width * height:
+        # nothing can move without an empty cell, so every board would stay solved
+        raise ValueError("%d pieces leave no empty cell on a %dx%d board" % (colors * per_color, width, height))
+    grid = get_grid(width, height, ())
+    for _ in range(GENERATE_ATTEMPTS):
+        masks = solved_masks(grid, colors, per_color, rng)
+        if masks is None:
+            continue
+        masks = scramble(grid, masks, difficulty, rng)
+        if any(mask & ~grid.neighbours(mask) for mask in masks):
+            break
+    else:
+        raise ValueError("no unsolved %dx%d board with %d colors of %d pieces found in %d attempts"
+                         % (width, height, colors, per_color, GENERATE_ATTEMPTS))
+    pieces = []
+    for color, mask in enumerate(masks):
+        for cell in iter_bits(mask):
+            pieces.append((PIECE_COLORS[color], cell // width, cell % width))
+    return pieces
+
+
+def generate_levels(count, width, height, colors, per_color, difficulty, seed):
+    rng = random.Random(seed)
+    for index in range(count):
+        name = "%dx%d-c%d-p%d-d%d-%d" % (width, height, colors, per_color, difficulty, index)
+        pieces = generate(width, height, colors, per_color, difficulty, rng)
+        yield encode(name, width, height, pieces, difficulty=difficulty, seed=seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate solvable levels as JSON lines on stdout.")
+    parser.add_argument("--size", type=int, nargs=2, default=[4, 4], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--colors", type=int, default=3)
+    parser.add_argument("--pieces", type=int, default=3, help="pieces per color")
+    parser.add_argument("--difficulty", type=int, default=20, help="scrambling moves away from a solved board")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    width, height = args.size
+    try:
+        for line in generate_levels(args.count, width, height, args.colors, args.pieces, args.difficulty, args.seed):
+            print(line)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
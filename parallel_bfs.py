@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+from queue import Empty
+
+from deadlock import DeadlockDetector
+from state import State, get_grid, move_between
+from stats import SearchCancelled
+
+CONTINUE = "continue"
+STOP = "stop"
+PARENT = "parent"
+
+
+def owner(bits, workers):
+    return hash(bits) % workers
+
+
+def pack(records, size):
+    # (child, parent) pairs as fixed-width little-endian ints in one bytes buffer
+    return b"".join(child.to_bytes(size, "little") + parent.to_bytes(size, "little") for child, parent in records)
+
+
+def unpack(buffer, size):
+    for offset in range(0, len(buffer), 2 * size):
+        yield (int.from_bytes(buffer[offset:offset + size], "little"),
+               int.from_bytes(buffer[offset + size:offset + 2 * size], "little"))
+
+
+def wait_for(queue):
+    # a worker outlives a coordinator that was killed before it could send STOP, so it gives up once its parent is gone
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if parent is not None and not parent.is_alive():
+                raise SystemExit()
+
+
+def shard_worker(index, workers, width, height, colors, start, inboxes, command_queue, results, prune=True):
+    # owns every state whose hash falls in its shard: its part of the visited set (with parent links) and frontier
+    grid = get_grid(width, height, colors)
+    deadlocks = DeadlockDetector(grid) if prune else None
+    size = (len(colors) * grid.cells + 7) // 8
+    visited = {}
+    frontier = []
+    if owner(start, workers) == index:
+        visited[start] = None
+        frontier.append(start)
+
+    while True:
+        command = wait_for(command_queue)
+        if command[0] == STOP:
+            return
+        if command[0] == PARENT:
+            results.put(visited.get(command[1]))
+            continue
+
+        # expand the local frontier and route every child to the shard that owns it
+        buckets = [[] for _ in range(workers)]
+        generated = 0
+        pruned = 0
+        for bits in frontier:
+            for _, child in State(grid, bits).successors():
+                generated += 1
+                buckets[owner(child.bits, workers)].append((child.bits, bits))
+        for other in range(workers):
+            if other != index:
+                inboxes[other].put(pack(buckets[other], size))
+
+        incoming = [buckets[index]]
+        for _ in range(workers - 1):
+            incoming.append(unpack(wait_for(inboxes[index]), size))
+
+        # keep only children this shard has never seen, and report any of them that is solved; dead ones are
+        # remembered as seen but never expanded, so only new states pay for the check
+        frontier = []
+        goal = None
+        for records in incoming:
+            for child, parent in records:
+                if child not in visited:
+                    visited[child] = parent
+                    if deadlocks is not None and deadlocks.joins_packed(child, move_between(grid, parent, child)) and \
+                            deadlocks.is_dead(State(grid, child).color_masks()):
+                        pruned += 1
+                        continue
+                    frontier.append(child)
+                    if goal is None and State(grid, child).is_solved():
+                        goal = child
+        results.put((len(frontier), len(visited), generated, pruned, goal))
+
+
+def receive(results, processes):
+    # a crashed worker would otherwise leave the coordinator waiting forever
+    while True:
+        try:
+            return results.get(timeout=1)
+        except Empty:
+            if not all(process.is_alive() for process in processes):
+                raise RuntimeError("a parallel BFS worker exited unexpectedly")
+
+
+def parallel_bfs(puzzle, workers=None, stats=None, prune=True):
+    # level-synchronous breadth-first search with the visited set sharded by state hash over worker processes
+    workers = workers or os.cpu_count()
+    start = puzzle.to_state()
+    grid = start.grid
+    if start.is_solved():
+        return [], 0
+
+    context = multiprocessing.get_context("spawn")
+    inboxes = [context.Queue() for _ in range(workers)]
+    commands = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    processes = [context.Process(target=shard_worker, daemon=True, args=(
+        index, workers, grid.width, grid.height, grid.colors, start.bits, inboxes, commands[index], results, prune))
+        for index in range(workers)]
+    for process in processes:
+        process.start()
+
+    nodes_explored = 0
+    try:
+        depth = 0
+        frontier = 1
+        goal = None
+        while frontier and goal is None:
+            if stats is not None:
+                if stats.cancelled():
+                    raise SearchCancelled()
+                stats.expanded += frontier
+                stats.bound = depth
+            for queue in commands:
+                queue.put((CONTINUE,))
+            frontier = 0
+            visited = 0
+            for _ in range(workers):
+                size, shard, generated, pruned, found = receive(results, processes)
+                frontier += size
+                visited += shard
+                if found is not None and goal is None:
+                    goal = found
+                if stats is not None:
+                    stats.generated += generated
+                    stats.pruned += pruned
+            nodes_explored += frontier
+            if stats is not None:
+                stats.frontier = frontier
+                stats.max_frontier = max(stats.max_frontier, frontier)
+                stats.visited = stats.max_visited = visited
+            depth += 1
+
+        if goal is None:
+            return None, nodes_explored
+
+        # walk the parent links back to the start, asking the shard that owns each state
+        path = []
+        bits = goal
+        while bits != start.bits:
+            commands[owner(bits, workers)].put((PARENT, bits))
+            parent = receive(results, processes)
+            path.append(move_between(grid, parent, bits))
+            bits = parent
+        path.reverse()
+        return path, nodes_explored
+    finally:
+        for queue in commands:
+            queue.put((STOP,))
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,140 @@
+import argparse
+import mmap
+import os
+from collections import deque
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+
+from state import get_grid, iter_bits
+
+MAGIC = b"CPDB"
+HEADER_SIZE = 8
+UNREACHABLE = 255
+PDB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdb")
+
+
+@lru_cache(maxsize=None)
+def binomial_table(cells, pieces):
+    return tuple(tuple(comb(cell, i) for i in range(pieces + 1)) for cell in range(cells))
+
+
+def rank(mask, binomials):
+    # combinatorial number system: sorted cells c1 < c2 < ... map to sum(C(ci, i))
+    index = 0
+    for i, cell in enumerate(iter_bits(mask), 1):
+        index += binomials[cell][i]
+    return index
+
+
+def database_path(width, height, pieces, directory=PDB_DIR):
+    return os.path.join(directory, "%dx%d-%d.pdb" % (width, height, pieces))
+
+
+def build(width, height, pieces):
+    # exact number of moves one color needs when every other piece is treated as a blank,
+    # found by a backward breadth-first search from every placement where all its pieces are joined
+    grid = get_grid(width, height, ())
+    binomials = binomial_table(grid.cells, pieces)
+    costs = bytearray([UNREACHABLE]) * comb(grid.cells, pieces)
+
+    queue = deque()
+    for cells in combinations(range(grid.cells), pieces):
+        mask = 0
+        for cell in cells:
+            mask |= 1 << cell
+        if not mask & ~grid.neighbours(mask):
+            costs[rank(mask, binomials)] = 0
+            queue.append(mask)
+
+    while queue:
+        mask = queue.popleft()
+        cost = costs[rank(mask, binomials)] + 1
+        for dst in iter_bits(mask):
+            for src in iter_bits(grid.neighbour_masks[dst] & ~mask):
+                # the piece on dst came from src, which is only legal if it was unjoined there
+                previous = mask ^ (1 << dst) ^ (1 << src)
+                if previous & ~grid.neighbours(previous) & (1 << src):
+                    index = rank(previous, binomials)
+                    if costs[index] == UNREACHABLE:
+                        costs[index] = min(cost, UNREACHABLE - 1)
+                        queue.append(previous)
+    return costs
+
+
+def write(path, width, height, pieces, costs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(MAGIC + bytes([width, height, pieces, 0]))
+        file.write(costs)
+
+
+class PatternDatabase:
+    def __init__(self, path, width=None, height=None, pieces=None):
+        # mapped read-only, so every process using the file shares the same pages; the header must match
+        # the board the caller asked for, and the file must hold one cost per placement
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER_SIZE or self.data[:4] != MAGIC:
+            raise ValueError("%s is not a pattern database" % path)
+        self.width = self.data[4]
+        self.height = self.data[5]
+        self.pieces = self.data[6]
+        for name, expected, found in (("width", width, self.width), ("height", height, self.height),
+                                      ("pieces", pieces, self.pieces)):
+            if expected is not None and expected != found:
+                raise ValueError("%s has %s %d, expected %d" % (path, name, found, expected))
+        size = HEADER_SIZE + comb(self.width * self.height, self.pieces)
+        if len(self.data) != size:
+            raise ValueError("%s is %d bytes long, expected %d" % (path, len(self.data), size))
+        self.binomials = binomial_table(self.width * self.height, self.pieces)
+
+    def cost(self, mask):
+        return self.data[HEADER_SIZE + rank(mask, self.binomials)]
+
+
+@lru_cache(maxsize=None)
+def load(path, width=None, height=None, pieces=None):
+    return PatternDatabase(path, width, height, pieces)
+
+
+def load_pattern_databases(width, height, counts, directory=PDB_DIR):
+    # one database per color, or None when any of them has not been built
+    databases = []
+    for pieces in counts:
+        path = database_path(width, height, pieces, directory)
+        if not os.path.exists(path):
+            return None
+        databases.append(load(path, width, height, pieces))
+    return databases
+
+
+def piece_count(text):
+    pieces = int(text)
+    if pieces < 2:
+        raise argparse.ArgumentTypeError("a color needs at least two pieces to be joined, got %d" % pieces)
+    return pieces
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the pattern databases used by the A* and IDA* heuristics.")
+    parser.add_argument("--size", type=int, nargs="+", default=[4], help="board sizes to build")
+    parser.add_argument("--pieces", type=piece_count, nargs="+", default=[2, 3, 4], help="pieces per color to build")
+    parser.add_argument("--out", default=PDB_DIR)
+    args = parser.parse_args(argv)
+    for size in args.size:
+        for pieces in args.pieces:
+            if pieces > size * size:
+                parser.error("%d pieces do not fit on a %dx%d board" % (pieces, size, size))
+
+    for size in args.size:
+        for pieces in args.pieces:
+            costs = build(size, size, pieces)
+            path = database_path(size, size, pieces, args.out)
+            write(path, size, size, pieces, costs)
+            solvable = [cost for cost in costs if cost != UNREACHABLE]
+            print("%s: %d placements, %d solvable, max cost %d" % (path, len(costs), len(solvable), max(solvable)))
+
+
+if __name__ == "__main__":
+    main()
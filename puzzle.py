@@ -0,0 +1,163 @@
+from constants import BLUE, GREEN, RED
+from piece import Piece
+from state import State, neighbour_table
+from transposition import zobrist_key, zobrist_hash
+
+
+class Puzzle:
+    def __init__(self, width, height, pieces=None):
+        self.width = width
+        self.height = height
+        self.pieces = self.create_pieces() if pieces is None else pieces
+        self.neighbours = neighbour_table(width, height)
+        self.cells = [[None for col in range(width)] for row in range(height)]
+        for piece in self.pieces:
+            self.cells[piece.row][piece.col] = piece
+        self.moves = 0
+        self.all_moves = []
+        self.hash = zobrist_hash(self.pieces)
+        self.check_joined_pieces()
+
+        # per-color bitmasks kept next to the piece grid so heuristics and snapshots cost O(colors)
+        state = State.from_pieces(width, height, self.pieces)
+        self.grid = state.grid
+        self.masks = state.color_masks()
+        self.color_index = {color: index for index, color in enumerate(self.grid.colors)}
+
+    def create_pieces(self):
+        return [
+            Piece(BLUE, 0, 0),
+            Piece(BLUE, 1, 1),
+            Piece(BLUE, 2, 2),
+            Piece(GREEN, 3, 3),
+            Piece(GREEN, 1, 3),
+            Piece(GREEN, 0, 2),
+            Piece(RED, 0, 3),
+            Piece(RED, 1, 2),
+            Piece(RED, 3, 0)
+        ]
+
+    def has_piece(self, row, col):
+        return self.cells[row][col] is not None
+
+    def piece_at(self, row, col):
+        return self.cells[row][col]
+
+    def can_move_piece(self, piece, row, col):
+        if piece.joined:
+            return False
+        if (abs(row - piece.row) == 1 and col == piece.col) or (abs(col - piece.col) == 1 and row == piece.row):
+            if self.cells[row][col] is None:
+                return True
+        return False
+
+    def get_possible_moves(self, piece):
+        if piece.joined:
+            return []
+        return [(row, col) for row, col in self.neighbours[piece.row][piece.col] if self.cells[row][col] is None]
+
+    def get_all_moves(self):
+        # every legal move of the position as (from_row, from_col, to_row, to_col)
+        moves = []
+        for piece in self.pieces:
+            if piece.joined:
+                continue
+            for row, col in self.neighbours[piece.row][piece.col]:
+                if self.cells[row][col] is None:
+                    moves.append((piece.row, piece.col, row, col))
+        return moves
+
+    def set_links(self, piece, links):
+        # a piece is joined while it touches at least one piece of its own color
+        was_joined = piece.joined
+        piece.links = links
+        piece.joined = links > 0
+        if piece.joined != was_joined:
+            self.unjoined += 1 if was_joined else -1
+
+    def link(self, piece, delta):
+        for row, col in self.neighbours[piece.row][piece.col]:
+            other = self.cells[row][col]
+            if other is not None and other.color == piece.color:
+                self.set_links(other, other.links + delta)
+                self.set_links(piece, piece.links + delta)
+
+    def check_joined_pieces(self):
+        for piece in self.pieces:
+            piece.links = 0
+            piece.joined = False
+        self.unjoined = len(self.pieces)
+        for piece in self.pieces:
+            for row, col in self.neighbours[piece.row][piece.col]:
+                other = self.cells[row][col]
+                if other is not None and other.color == piece.color:
+                    self.set_links(piece, piece.links + 1)
+
+    def unjoined_count(self):
+        return self.unjoined
+
+    def win_condition(self):
+        return self.unjoined == 0
+
+    def move_piece(self, piece, row, col):
+        self.link(piece, -1)
+        self.masks[self.color_index[piece.color]] ^= (1 << (piece.row * self.width + piece.col)) | (1 << (row * self.width + col))
+        self.cells[piece.row][piece.col] = None
+        self.hash ^= zobrist_key(piece.color, piece.row, piece.col) ^ zobrist_key(piece.color, row, col)
+        piece.row = row
+        piece.col = col
+        self.cells[row][col] = piece
+        self.link(piece, 1)
+
+    def make_move(self, move):
+        from_row, from_col, to_row, to_col = move
+        piece = self.piece_at(from_row, from_col)
+
+        if piece is None:
+            return False
+
+        if not self.can_move_piece(piece, to_row, to_col):
+            return False
+
+        self.all_moves.append((from_row, from_col, to_row, to_col))
+        self.move_piece(piece, to_row, to_col)
+        self.moves += 1
+        return True
+
+    def undo_move(self):
+        # exact inverse of make_move: links, joined flags, masks, hash and the move counter all come back
+        if len(self.all_moves) == 0:
+            return None
+        last_move = self.all_moves.pop()
+        from_row, from_col, to_row, to_col = last_move
+        self.move_piece(self.piece_at(to_row, to_col), from_row, from_col)
+        self.moves -= 1
+        return last_move
+
+    def rewind(self, length):
+        # undo moves until only the first length of them remain
+        while len(self.all_moves) > length:
+            self.undo_move()
+
+    def get_last_move(self):
+        if len(self.all_moves) == 0:
+            return None
+        return self.all_moves[-1][0], self.all_moves[-1][1]
+
+    def color_masks(self):
+        return self.masks
+
+    def unjoined_masks(self):
+        return [mask & ~self.grid.neighbours(mask) for mask in self.masks]
+
+    def to_state(self):
+        bits = 0
+        for index, mask in enumerate(self.masks):
+            bits |= mask << (index * self.grid.cells)
+        return State(self.grid, bits)
+
+    def copy(self):
+        copy = Puzzle(self.width, self.height, [Piece(piece.color, piece.row, piece.col) for piece in self.pieces])
+        copy.moves = self.moves
+        copy.all_moves = list(self.all_moves)
+        return copy
@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from functools import lru_cache
+
+from symmetry import get_symmetries
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solutions.db")
+MEMORY_SIZE = 1024
+
+# solutions from these modes are shortest paths, so they can answer a request for any mode
+OPTIMAL_MODES = ("bfs", "a_star", "ida_star")
+
+
+@lru_cache(maxsize=None)
+def get_solution_cache(path=CACHE_PATH):
+    # one connection per process, shared by every board of the session
+    return SolutionCache(path)
+
+
+class SolutionCache:
+    def __init__(self, path=CACHE_PATH, memory_size=MEMORY_SIZE):
+        self.path = path
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            "width INTEGER, height INTEGER, state TEXT, algorithm TEXT, cost INTEGER, moves TEXT, "
+            "PRIMARY KEY (width, height, state, algorithm))")
+        self.connection.commit()
+
+    def canonical(self, puzzle):
+        # rotations, reflections and relabelled colors of a board share one entry
+        symmetries = get_symmetries(puzzle.width, puzzle.height)
+        key, symmetry = symmetries.canonical(puzzle.color_masks())
+        return symmetries, "%x" % key, symmetry
+
+    def remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def lookup(self, width, height, state, algorithm):
+        key = (width, height, state, algorithm)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        row = self.connection.execute(
+            "SELECT algorithm, cost, moves FROM solutions WHERE width = ? AND height = ? AND state = ? "
+            "AND (algorithm = ? OR algorithm IN (%s)) ORDER BY cost LIMIT 1" % ", ".join("?" * len(OPTIMAL_MODES)),
+            (width, height, state, algorithm) + OPTIMAL_MODES).fetchone()
+        entry = None
+        if row is not None:
+            entry = (row[0], row[1], [tuple(move) for move in json.loads(row[2])])
+        self.remember(key, entry)
+        return entry
+
+    def get(self, puzzle, algorithm):
+        # the cached moves turned back to the orientation of this puzzle, or None
+        symmetries, state, symmetry = self.canonical(puzzle)
+        entry = self.lookup(puzzle.width, puzzle.height, state, algorithm)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [symmetries.unmap_move(move, symmetry) for move in entry[2]]
+
+    def put(self, puzzle, algorithm, moves):
+        # moves are stored on the canonical board so any symmetric copy of the puzzle can reuse them
+        symmetries, state, symmetry = self.canonical(puzzle)
+        canonical_moves = [symmetries.map_move(move, symmetry) for move in moves]
+        self.connection.execute(
+            "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+            (puzzle.width, puzzle.height, state, algorithm, len(moves), json.dumps(canonical_moves)))
+        self.connection.commit()
+
+        # a new optimal solution can also answer lookups that missed for other modes
+        for key in [key for key in self.memory if key[:3] == (puzzle.width, puzzle.height, state)]:
+            del self.memory[key]
+
+    def clear(self):
+        self.connection.execute("DELETE FROM solutions")
+        self.connection.commit()
+        self.memory.clear()
+
+    def close(self):
+        self.connection.close()
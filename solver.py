@@ -1,205 +1,624 @@
 import sys
+from array import array
 from collections import deque
 from heapq import heappush, heappop
-from queue import PriorityQueue
-from copy import deepcopy
-
-class Node:
-    def __init__(self, board, depth, cost, move=None):
-        self.board = board
-        self.depth = depth
-        self.cost = cost
-        self.move = move
-    
-    def __lt__(self, other):
-        return self.cost < other.cost
-    
-    def __eq__(self, other):
-        return self.board == other.board
-    
-    def __hash__(self):
-        return hash(str(self.board))
+from time import perf_counter
+
+from constants import MINIMAX_DEPTH, IDA_STAR_CACHE_SIZE, BIDIRECTIONAL_GOAL_LIMIT, ANYTIME_TIME_LIMIT, ANYTIME_WEIGHTS
+from deadlock import DeadlockDetector
+from parallel_bfs import parallel_bfs
+from pattern_db import load_pattern_databases, UNREACHABLE
+from state import State, iter_bits, move_between
+from symmetry import get_symmetries
+from stats import SearchStats, SearchCancelled
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+WIN_SCORE = 1000
+FOUND = -1
+
+
+class NodeStore:
+    # search nodes kept as parallel arrays indexed by node id, paths are only rebuilt at the goal
+    def __init__(self, width, height):
+        self.width = width
+        self.cells = width * height
+        self.states = []
+        self.parents = array("l")
+        self.moves = array("l")
+        self.depths = array("l")
+
+    def __len__(self):
+        return len(self.states)
+
+    def add(self, bits, parent=-1, move=None, depth=0):
+        self.states.append(bits)
+        self.parents.append(parent)
+        if move is None:
+            self.moves.append(-1)
+        else:
+            from_row, from_col, to_row, to_col = move
+            self.moves.append((from_row * self.width + from_col) * self.cells + to_row * self.width + to_col)
+        self.depths.append(depth)
+        return len(self.states) - 1
+
+    def path(self, node):
+        path = []
+        while self.parents[node] != -1:
+            src, dst = divmod(self.moves[node], self.cells)
+            path.append((src // self.width, src % self.width, dst // self.width, dst % self.width))
+            node = self.parents[node]
+        path.reverse()
+        return path
+
 
 class Solver:
 
-    def __init__(self, board):
-        self.board = board
-
-    def disjoint_groups_heuristic(self):
-        counts = {}
-        for piece in self.board.pieces:
-            if not piece.joined:
-                if piece.color not in counts:
-                    counts[piece.color] = 1
-                    stack = [(piece.row, piece.col)]
-                    while stack:
-                        row, col = stack.pop()
-                        piece = next((p for p in self.board.pieces if p.row == row and p.col == col), None)
-                        if piece and not piece.joined and piece.color == counts[piece.color]:
-                            piece.joined = True
-                            if row > 0:
-                                stack.append((row - 1, col))
-                            if row < self.board.height - 1:
-                                stack.append((row + 1, col))
-                            if col > 0:
-                                stack.append((row, col - 1))
-                            if col < self.board.width - 1:
-                                stack.append((row, col + 1))
-                else:
-                    counts[piece.color] += 1
-        return sum(counts.values())
-
-    def count_unjoined_pieces_heuristic(self):
-        return len([piece for piece in self.board.pieces if not piece.joined])
-
-    def minimax(self, depth, maximizing_player):
-        if depth == 0 or self.board.win_condition():
-            return None, self.count_unjoined_pieces_heuristic()
-        
-        if maximizing_player:
-            best_value = -sys.maxsize
-            best_move = None
-            for move in self.board.get_possible_moves():
-                if move == self.board.get_last_move():
-                    continue
-                self.board.make_move(move)
-                _, value = self.minimax(depth - 1, False)
-                self.board.undo_move()
-                if value > best_value:
-                    best_value = value
-                    best_move = move
-            return best_move, best_value
+    def __init__(self, puzzle, stats=None, heuristic=None, canonical=False, prune=True):
+        self.puzzle = puzzle
+        self.symmetries = get_symmetries(puzzle.width, puzzle.height) if canonical else None
+        self.deadlocks = DeadlockDetector(puzzle.grid) if prune else None
+        self.pattern_databases = load_pattern_databases(
+            puzzle.width, puzzle.height, [mask.bit_count() for mask in puzzle.color_masks()])
+        if heuristic is None:
+            heuristic = self.pattern_database_heuristic if self.pattern_databases else self.gathering_heuristic
+        self.heuristic = heuristic
+        self.table = TranspositionTable()
+        self.killers = {}
+        self.history = {}
+        self.stats = SearchStats() if stats is None else stats
+        self.optimal = None
+
+    def solve(self, mode, time_limit=None, node_limit=None):
+        # runs the chosen algorithm without touching the puzzle and returns the moves it found;
+        # the limits are the anytime budget, ANYTIME_TIME_LIMIT seconds unless given
+        self.stats.reset()
+        self.optimal = None
+        if mode not in ("minimax", "iterative_deepening") and self.deadlocks is not None and \
+                self.deadlocks.is_dead(self.puzzle.color_masks()):
+            # only moves that join a piece are checked during the search, so the start is checked once here
+            return None
+        if mode == "bfs":
+            moves, _ = self.bfs(self.puzzle)
+        elif mode == "bidirectional":
+            moves, _ = self.bidirectional()
+        elif mode == "parallel_bfs":
+            moves, _ = parallel_bfs(self.puzzle, stats=self.stats, prune=self.deadlocks is not None)
+        elif mode == "a_star":
+            moves, _ = self.astar()
+        elif mode == "anytime":
+            if time_limit is None:
+                time_limit = ANYTIME_TIME_LIMIT
+            moves, self.optimal = self.anytime(time_limit, node_limit)
+        elif mode == "greedy":
+            moves = self.greedy(self.puzzle)
+        elif mode == "ida_star":
+            moves, _ = self.ida_star(IDA_STAR_CACHE_SIZE)
+        elif mode in ("iterative_deepening", "minimax"):
+            # played on the puzzle itself and taken back afterwards, even when the search is cancelled
+            length = len(self.puzzle.all_moves)
+            try:
+                moves = list(self.play_minimax(MINIMAX_DEPTH, iterative=mode == "iterative_deepening"))
+            finally:
+                self.puzzle.rewind(length)
         else:
-            best_value = sys.maxsize
-            best_move = None
-            for move in self.board.get_possible_moves():
-                if move == self.board.get_last_move():
-                    continue
-                self.board.make_move(move)
-                _, value = self.minimax(depth - 1, True)
-                self.board.undo_move()
-                if value < best_value:
-                    best_value = value
-                    best_move = move
-            return best_move, best_value
+            raise ValueError("unknown solver mode: %s" % mode)
+        return moves
 
-    
+    def play_minimax(self, depth, iterative=False):
+        # plays minimax moves on the puzzle one turn at a time until it is solved, stuck or repeating itself
+        seen = {}
+        while not self.puzzle.win_condition():
+            seen[self.puzzle.hash] = seen.get(self.puzzle.hash, 0) + 1
+            if seen[self.puzzle.hash] == 3:
+                return
+            self.table.new_search()
+            self.stats.bound = depth
+            if iterative:
+                move, _ = self.iterative_deepening(depth)
+            else:
+                move, _ = self.minimax(depth)
+            if move is None:
+                return
+            self.puzzle.make_move(move)
+            yield move
+
+    def disjoint_groups_heuristic(self, state):
+        # every unjoined piece is a group of its own and one move joins at most four of them
+        self.stats.heuristic_calls += 1
+        return sum((mask.bit_count() + 3) // 4 for mask in state.unjoined_masks())
+
+    def gathering_heuristic(self, state):
+        # an unjoined piece k cells away from its nearest same-color piece needs k - 1 moves of that color,
+        # and colors never share moves, so the per-color bounds add up
+        self.stats.heuristic_calls += 1
+        distance_masks = state.grid.distance_masks
+        total = 0
+        for mask, unjoined in zip(state.color_masks(), state.unjoined_masks()):
+            gap = 0
+            for cell in iter_bits(unjoined):
+                balls = distance_masks[cell]
+                others = mask & ~(1 << cell)
+                radius = 2
+                while radius < len(balls) and not balls[radius] & others:
+                    radius += 1
+                gap = max(gap, radius - 1)
+            total += max(gap, (unjoined.bit_count() + 3) // 4)
+        return total
+
+    def state_key(self, state):
+        # rotations, reflections and relabelled colors of a state share one key when canonical search is on
+        if self.symmetries is None:
+            return state.bits
+        return self.symmetries.canonical_key(state.color_masks())
+
+    def is_dead(self, state, move):
+        # states where some piece can no longer be joined are dropped as soon as they are generated
+        if self.deadlocks is None:
+            return False
+        masks = state.color_masks()
+        if not self.deadlocks.joins(masks, move):
+            return False
+        if self.deadlocks.is_dead(masks):
+            self.stats.pruned += 1
+            return True
+        return False
+
+    def pattern_database_heuristic(self, state):
+        # exact per-color costs with the other colors removed, so they add up without overestimating
+        self.stats.heuristic_calls += 1
+        total = 0
+        for mask, database in zip(state.color_masks(), self.pattern_databases):
+            cost = database.cost(mask)
+            if cost == UNREACHABLE:
+                return sys.maxsize
+            total += cost
+        return total
+
+    def count_unjoined_pieces_heuristic(self, state):
+        self.stats.heuristic_calls += 1
+        return state.unjoined_count()
+
+    def is_reverse_of_last_move(self, move):
+        if len(self.puzzle.all_moves) == 0:
+            return False
+        from_row, from_col, to_row, to_col = self.puzzle.all_moves[-1]
+        return move == (to_row, to_col, from_row, from_col)
+
+    def evaluate(self, depth):
+        # scored from the player's side: fewer unjoined pieces is better and sooner wins score higher
+        if self.puzzle.win_condition():
+            return WIN_SCORE + depth
+        return -self.count_unjoined_pieces_heuristic(self.puzzle)
+
+    def order_moves(self, moves, ply, hash_move):
+        # hash move first (it carries the previous iteration's principal variation), then killers, then history
+        killers = self.killers.get(ply, ())
+        moves.sort(key=lambda move: (move != hash_move, move not in killers, -self.history.get(move, 0)))
+        return moves
+
+    def record_cutoff(self, move, depth, ply):
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    def minimax(self, depth, alpha=-sys.maxsize, beta=sys.maxsize, ply=0):
+        # there is no opponent, so every ply picks the move that is best for the player
+        key = self.puzzle.hash
+        entry = self.table.probe(key)
+        hash_move = None
+        if entry is not None:
+            _, entry_depth, value, bound, hash_move, _ = entry
+            if value > WIN_SCORE // 2:
+                # wins are stored by how many moves away they are, so they fit any remaining depth
+                value += depth
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return hash_move, value
+                if bound == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                elif bound == UPPER_BOUND:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return hash_move, value
+
+        if depth == 0 or self.puzzle.win_condition():
+            return None, self.evaluate(depth)
+
+        all_moves = self.puzzle.get_all_moves()
+        if len(all_moves) == 0:
+            return None, self.evaluate(depth)
+        # stepping straight back is only considered when it is the only move left
+        possible_moves = [move for move in all_moves if not self.is_reverse_of_last_move(move)] or all_moves
+
+        self.stats.expand()
+        self.stats.generated += len(possible_moves)
+        original_alpha, original_beta = alpha, beta
+        # nothing scores better than winning with the next move
+        beta = min(beta, WIN_SCORE + depth - 1)
+        best_move = None
+        best_value = -sys.maxsize
+        for move in self.order_moves(possible_moves, ply, hash_move):
+            self.puzzle.make_move(move)
+            _, value = self.minimax(depth - 1, alpha, beta, ply + 1)
+            self.puzzle.undo_move()
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.record_cutoff(move, depth, ply)
+                break
+
+        if best_value <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_value >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        stored = best_value - depth if best_value > WIN_SCORE // 2 else best_value
+        self.table.store(key, depth, stored, bound, best_move)
+        return best_move, best_value
 
-    def bfs(self, board):
-        # initialize queue with initial board
-        queue = deque([(board, [])])
+    def iterative_deepening(self, max_depth):
+        # each iteration starts from the moves the previous one stored in the transposition table
+        best_move = None
+        best_value = -sys.maxsize
+        for depth in range(1, max_depth + 1):
+            self.stats.bound = depth
+            move, value = self.minimax(depth)
+            if move is None:
+                break
+            best_move, best_value = move, value
+            if value >= WIN_SCORE:
+                break
+        return best_move, best_value
+
+    def bfs(self, puzzle):
+        stats = self.stats
+        clock = stats.clock
+
+        # initialize queue with the root node
+        start = puzzle.to_state()
+        nodes = NodeStore(start.grid.width, start.grid.height)
+        queue = deque([nodes.add(start.bits)])
 
         # initialize set to keep track of visited states
-        visited = set()
+        state_key = self.state_key
+        visited = {state_key(start)}
 
         # initialize node counter
         nodes_explored = 0
 
         while queue:
-            # get next board and path from queue
-            board, path = queue.popleft()
+            # get next node from queue
+            node = queue.popleft()
+            state = State(start.grid, nodes.states[node])
+            stats.bound = nodes.depths[node]
+            stats.expand(len(queue), len(visited))
 
             # check if board is complete
-            if board.win_condition():
-                return path
-
-            # generate children and add to queue if not visited before
-            board.selected_tile = board.get_first_tile()
-            if board.selected_tile is None:
-                return path
-            for move in board.get_possible_moves():
-                new_board = board.copy()
-                new_board.make_move(move)
-                if new_board not in visited:
-                    queue.append((new_board, path + [move]))
+            started = clock()
+            solved = state.is_solved()
+            stats.win_time += clock() - started
+            if solved:
+                return nodes.path(node), nodes_explored
+
+            started = clock()
+            children = list(state.successors())
+            stats.move_time += clock() - started
+            stats.generated += len(children)
+
+            # add children to queue if not visited before
+            started = clock()
+            depth = nodes.depths[node] + 1
+            for move, child in children:
+                key = state_key(child)
+                if key in visited:
+                    stats.duplicates += 1
+                    continue
+                visited.add(key)
+                if not self.is_dead(child, move):
+                    queue.append(nodes.add(child.bits, node, move, depth))
                     nodes_explored += 1
-                    visited.add(new_board)
+            stats.hash_time += clock() - started
 
         # if no complete board is found, return None
         return None, nodes_explored
 
 
-    def greedy(self, board):
+    def check_cancelled(self):
+        if self.stats.cancelled():
+            raise SearchCancelled()
+
+    def bidirectional(self):
+        stats = self.stats
+        start = self.puzzle.to_state()
+        grid = start.grid
+        goals = start.goals(BIDIRECTIONAL_GOAL_LIMIT, self.check_cancelled)
+        if goals is None:
+            # too many solved layouts to search backwards from, so this is plain breadth-first search
+            return self.bfs(self.puzzle)
+
+        # each side maps a state to its neighbour towards its root: the start going forwards, a goal going backwards
+        forward = {start.bits: None}
+        backward = dict.fromkeys(goals)
+        forward_frontier = [start.bits]
+        backward_frontier = list(goals)
+        forward_depth = backward_depth = 0
+        nodes_explored = 0
+        meet = start.bits if start.bits in backward else None
+
+        while meet is None and forward_frontier and backward_frontier:
+            # grow the smaller frontier by one whole level
+            forwards = len(forward_frontier) <= len(backward_frontier)
+            if forwards:
+                frontier, links, other, depth = forward_frontier, forward, backward, forward_depth
+            else:
+                frontier, links, other, depth = backward_frontier, backward, forward, backward_depth
+            stats.bound = forward_depth + backward_depth
+
+            # every meeting found on this level completes a path of the same, shortest length
+            next_frontier = []
+            for bits in frontier:
+                stats.expand(len(frontier), len(forward) + len(backward))
+                state = State(grid, bits)
+                children = state.successors() if forwards else state.predecessors()
+                for move, child in children:
+                    stats.generated += 1
+                    if child.bits in links:
+                        stats.duplicates += 1
+                        continue
+                    links[child.bits] = bits
+                    if forwards and self.is_dead(child, move):
+                        continue
+                    next_frontier.append(child.bits)
+                    nodes_explored += 1
+                    if child.bits in other:
+                        meet = child.bits
+                        break
+                if meet is not None:
+                    break
+
+            if forwards:
+                forward_frontier = next_frontier
+                forward_depth += 1
+            else:
+                backward_frontier = next_frontier
+                backward_depth += 1
+
+        if meet is None:
+            return None, nodes_explored
+
+        path = []
+        bits = meet
+        while forward[bits] is not None:
+            path.append(move_between(grid, forward[bits], bits))
+            bits = forward[bits]
+        path.reverse()
+        bits = meet
+        while backward[bits] is not None:
+            path.append(move_between(grid, bits, backward[bits]))
+            bits = backward[bits]
+        return path, nodes_explored
+
+    def greedy(self, puzzle):
+        stats = self.stats
+        clock = stats.clock
+
         # initialize list of moves
         moves = []
+        state = puzzle.to_state()
+        visited = {self.state_key(state)}
 
         # repeat until game is complete
-        while not board.win_condition():
-            # get all possible moves
-            possible_moves = board.get_possible_moves()
+        while True:
+            started = clock()
+            solved = state.is_solved()
+            stats.win_time += clock() - started
+            if solved:
+                return moves
+            stats.bound = len(moves)
+            stats.expand(0, len(visited))
+
+            started = clock()
+            children = list(state.successors())
+            stats.move_time += clock() - started
+            stats.generated += len(children)
+
+            # get all possible moves that lead to unseen states
+            started = clock()
+            possible_moves = [(move, child) for move, child in children if self.state_key(child) not in visited]
+            stats.hash_time += clock() - started
+            stats.duplicates += len(children) - len(possible_moves)
+            possible_moves = [(move, child) for move, child in possible_moves if not self.is_dead(child, move)]
             if len(possible_moves) == 0:
                 return moves
             # initialize best move and its score
-            best_move = possible_moves[0]
-            best_score = 0
+            best_move, best_child = possible_moves[0]
+            best_score = sys.maxsize
 
             # evaluate all possible moves
-            for move in possible_moves:
-                new_board = board.copy()
-                new_board.make_move(move)
-                new_solver = Solver(new_board)
-                score = new_solver.count_unjoined_pieces_heuristic()
-                if score > best_score:
-                    best_move = move
+            for move, child in possible_moves:
+                score = self.heuristic(child)
+                if score < best_score:
+                    best_move, best_child = move, child
                     best_score = score
 
-            # add best move to list of moves and update board
+            # add best move to list of moves and update state
             moves.append(best_move)
-            board.make_move(best_move)
-
-        return moves
+            state = best_child
+            visited.add(self.state_key(state))
 
     
-    def iterative_deepening(self, max_depth):
-        best_move = None
-        best_value = -sys.maxsize
-        for depth in range(1, max_depth + 1):
-            for move in self.board.get_possible_moves():
-                self.board.make_move(move)
-                value = self.minimax(depth, False)
-                self.board.undo_move()
-                if value > best_value:
-                    best_value = value
-                    best_move = move
-        return best_move
-    
+    def astar(self, weight=1, cost_limit=sys.maxsize, over_budget=None):
+        # weight > 1 trades optimality for speed, and paths that cannot get under cost_limit are never opened
+        stats = self.stats
+        clock = stats.clock
 
-    def astar(self):
-        # initialize queue with initial board
-        queue = deque([(self.board, [])])
+        start = self.puzzle.to_state()
+        start_h = self.heuristic(start)
+        nodes = NodeStore(start.grid.width, start.grid.height)
 
-        # initialize set to keep track of visited states
-        visited = set()
+        # open list is a heap of node ids ordered by f = g + weight * h, ties broken on the smaller h
+        start_key = self.state_key(start)
+        open_list = [(weight * start_h, start_h, nodes.add(start.bits), start_key)]
+
+        # best known cost to reach every state and the states already expanded
+        best_g = {start_key: 0}
+        closed = set()
 
         # initialize node counter
         nodes_explored = 0
 
-        while queue:
-            # get next board and path from queue
-            board, path = queue.popleft()
+        while open_list:
+            f, _, node, key = heappop(open_list)
+
+            # skip states already expanded through a path at least as cheap
+            if key in closed:
+                stats.duplicates += 1
+                continue
+            if over_budget is not None and over_budget():
+                raise SearchCancelled()
+            stats.bound = f
+            stats.expand(len(open_list), len(best_g))
 
             # check if board is complete
-            if board.win_condition():
-                return path, nodes_explored
-
-            # generate children and add to queue if not visited before
-            for move in board.get_possible_moves():
-                new_board = board.copy()
-                new_board.make_move(move)
-                new_path = path + [move]
-                if new_board not in visited:
-                    queue.append((new_board, new_path))
+            state = State(start.grid, nodes.states[node])
+            started = clock()
+            solved = state.is_solved()
+            stats.win_time += clock() - started
+            if solved:
+                return nodes.path(node), nodes_explored
+
+            closed.add(key)
+
+            started = clock()
+            children = list(state.successors())
+            stats.move_time += clock() - started
+            stats.generated += len(children)
+
+            child_g = nodes.depths[node] + 1
+            for move, child in children:
+                started = clock()
+                child_key = self.state_key(child)
+                improved = child_g < best_g.get(child_key, sys.maxsize)
+                stats.hash_time += clock() - started
+                if improved:
+                    if self.is_dead(child, move):
+                        continue
+                    # a cheaper path reopens a state that was already expanded
+                    best_g[child_key] = child_g
+                    closed.discard(child_key)
+                    h = self.heuristic(child)
+                    if child_g + h >= cost_limit:
+                        continue
+                    heappush(open_list, (child_g + weight * h, h, nodes.add(child.bits, node, move, child_g), child_key))
                     nodes_explored += 1
-                    visited.add(new_board)
-
-            # sort queue based on f_score
-            queue = deque(sorted(queue, key=lambda x: self.f_score(x[0], x[1])))
+                else:
+                    stats.duplicates += 1
 
         # if no complete board is found, return None
         return None, nodes_explored
 
-    def f_score(self, board, path):
-        return len(path) + self.board.count_unjoined_pieces_heuristic()
-
-
-
+    def anytime(self, time_limit=None, node_limit=None, weights=ANYTIME_WEIGHTS):
+        # weighted A* rerun with smaller and smaller weights, each run only looking for a path shorter than the
+        # best one so far; returns that best path when the budget runs out, and whether it is known to be optimal
+        stats = self.stats
+        deadline = None if time_limit is None else perf_counter() + time_limit
+
+        def over_budget():
+            return (deadline is not None and perf_counter() > deadline) or \
+                   (node_limit is not None and stats.expanded >= node_limit)
+
+        best = None
+        for weight in weights:
+            try:
+                path, _ = self.astar(weight, sys.maxsize if best is None else len(best), over_budget)
+            except SearchCancelled:
+                if stats.cancelled():
+                    raise
+                return best, False
+            if path is None:
+                # nothing shorter exists, so the best path so far is optimal (or there is no solution at all)
+                return best, True
+            best = path
+            if weight == 1:
+                return best, True
+        return best, False
+
+    def ida_star(self, cache_size=0):
+        # depth-first on the puzzle itself with make/undo, so memory grows only with the solution depth
+        puzzle = self.puzzle
+        length = len(puzzle.all_moves)
+        try:
+            return self.ida_iterations(puzzle, cache_size)
+        finally:
+            puzzle.rewind(length)
+
+    def ida_iterations(self, puzzle, cache_size):
+        cache = TranspositionTable(cache_size) if cache_size else None
+        path = []
+        on_path = {puzzle.hash}
+        self.nodes_explored = 0
+
+        bound = self.heuristic(puzzle)
+        while True:
+            if cache is not None:
+                cache.new_search()
+            self.stats.bound = bound
+            result = self.ida_search(puzzle, 0, bound, path, on_path, cache)
+            if result == FOUND:
+                return path, self.nodes_explored
+            if result == sys.maxsize:
+                return None, self.nodes_explored
+            bound = result
+
+    def ida_search(self, puzzle, g, bound, path, on_path, cache):
+        f = g + self.heuristic(puzzle)
+        if f > bound:
+            return f
+        if puzzle.win_condition():
+            return FOUND
+
+        # a cached entry from this iteration already searched this state with at least as much budget left
+        if cache is not None:
+            if self.symmetries is None:
+                key = puzzle.hash
+            else:
+                key = self.symmetries.canonical_hash(puzzle.color_masks())
+            entry = cache.probe(key)
+            if entry is not None and entry[5] == cache.age and entry[1] >= bound - g:
+                return g + entry[2]
+
+        self.stats.expand(len(path), len(on_path))
+        moves = puzzle.get_all_moves()
+        self.stats.generated += len(moves)
+
+        minimum = sys.maxsize
+        for move in moves:
+            puzzle.make_move(move)
+            if puzzle.hash in on_path:
+                puzzle.undo_move()
+                self.stats.duplicates += 1
+                continue
+            if self.is_dead(puzzle, move):
+                puzzle.undo_move()
+                continue
+            self.nodes_explored += 1
+            path.append(move)
+            on_path.add(puzzle.hash)
+
+            result = self.ida_search(puzzle, g + 1, bound, path, on_path, cache)
+            if result == FOUND:
+                return FOUND
+
+            on_path.discard(puzzle.hash)
+            path.pop()
+            puzzle.undo_move()
+            minimum = min(minimum, result)
+
+        if cache is not None and minimum != sys.maxsize:
+            cache.store(key, bound - g, minimum - g, EXACT, None)
+        return minimum
@@ -0,0 +1,217 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def neighbour_table(width, height):
+    # orthogonal neighbours of every (row, col), computed once per board size
+    table = []
+    for row in range(height):
+        table.append(tuple(
+            tuple((r, c) for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1))
+                  if 0 <= r < height and 0 <= c < width)
+            for col in range(width)))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def distance_table(width, height):
+    # for every cell index, the mask of cells within Manhattan distance 0, 1, 2, ... of it
+    table = []
+    for cell in range(width * height):
+        row, col = divmod(cell, width)
+        balls = [0] * (width + height - 1)
+        for other in range(width * height):
+            distance = abs(other // width - row) + abs(other % width - col)
+            balls[distance] |= 1 << other
+        for radius in range(1, len(balls)):
+            balls[radius] |= balls[radius - 1]
+        table.append(tuple(balls))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def get_grid(width, height, colors):
+    return Grid(width, height, colors)
+
+
+class Grid:
+    def __init__(self, width, height, colors):
+        self.width = width
+        self.height = height
+        self.colors = tuple(colors)
+        self.cells = width * height
+        self.full_mask = (1 << self.cells) - 1
+
+        first_col = 0
+        last_col = 0
+        for row in range(height):
+            first_col |= 1 << (row * width)
+            last_col |= 1 << (row * width + width - 1)
+        self.not_first_col = self.full_mask & ~first_col
+        self.not_last_col = self.full_mask & ~last_col
+        self.neighbour_masks = tuple(self.neighbours(1 << cell) for cell in range(self.cells))
+        self.distance_masks = distance_table(width, height)
+
+    def neighbours(self, mask):
+        # every cell orthogonally adjacent to a cell of the mask
+        return ((mask << 1) & self.not_first_col) | ((mask >> 1) & self.not_last_col) | \
+               ((mask << self.width) & self.full_mask) | (mask >> self.width)
+
+
+def move_between(grid, parent, child):
+    # the (from_row, from_col, to_row, to_col) move that turns one packed state into the other
+    changed = parent ^ child
+    src = ((parent & changed).bit_length() - 1) % grid.cells
+    dst = ((child & changed).bit_length() - 1) % grid.cells
+    return src // grid.width, src % grid.width, dst // grid.width, dst % grid.width
+
+
+@lru_cache(maxsize=None)
+def connected_placements(grid, pieces, limit=None):
+    # every connected set of that many cells, grown one neighbouring cell at a time;
+    # None as soon as a step holds more than limit sets, before the larger ones are built
+    placements = {1 << cell for cell in range(grid.cells)}
+    for _ in range(pieces - 1):
+        placements = {mask | 1 << cell for mask in placements for cell in iter_bits(grid.neighbours(mask) & ~mask)}
+        if limit is not None and len(placements) > limit:
+            return None
+    return frozenset(placements)
+
+
+@lru_cache(maxsize=None)
+def solved_placements(grid, pieces, limit=None):
+    # every set of cells in which each cell touches another one: disjoint connected groups of two or more;
+    # None once there are more than limit of them
+    if pieces < 2:
+        # a lone piece has nothing of its color to touch
+        return frozenset()
+    placements = connected_placements(grid, pieces, limit)
+    if placements is None:
+        return None
+    placements = set(placements)
+    for size in range(2, pieces - 1):
+        groups = connected_placements(grid, size, limit)
+        rests = solved_placements(grid, pieces - size, limit)
+        if groups is None or rests is None:
+            return None
+        for group in groups:
+            for rest in rests:
+                if not group & rest:
+                    placements.add(group | rest)
+            if limit is not None and len(placements) > limit:
+                return None
+    return frozenset(placements)
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class State:
+    # one bitmask per color packed into a single int: color i owns bits [i * cells, (i + 1) * cells)
+    __slots__ = ("grid", "bits")
+
+    def __init__(self, grid, bits):
+        self.grid = grid
+        self.bits = bits
+
+    @classmethod
+    def from_pieces(cls, width, height, pieces):
+        colors = []
+        for piece in pieces:
+            if piece.color not in colors:
+                colors.append(piece.color)
+        grid = get_grid(width, height, tuple(colors))
+        bits = 0
+        for piece in pieces:
+            bits |= 1 << (colors.index(piece.color) * grid.cells + piece.row * width + piece.col)
+        return cls(grid, bits)
+
+    def __eq__(self, other):
+        return isinstance(other, State) and self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __repr__(self):
+        return "State(%dx%d, %#x)" % (self.grid.width, self.grid.height, self.bits)
+
+    def color_masks(self):
+        grid = self.grid
+        return [(self.bits >> (i * grid.cells)) & grid.full_mask for i in range(len(grid.colors))]
+
+    def occupied(self):
+        occupied = 0
+        for mask in self.color_masks():
+            occupied |= mask
+        return occupied
+
+    def unjoined_masks(self):
+        grid = self.grid
+        return [mask & ~grid.neighbours(mask) for mask in self.color_masks()]
+
+    def unjoined_count(self):
+        return sum(mask.bit_count() for mask in self.unjoined_masks())
+
+    def is_solved(self):
+        return not any(self.unjoined_masks())
+
+    def successors(self):
+        grid = self.grid
+        width = grid.width
+        neighbour_masks = grid.neighbour_masks
+        empty = grid.full_mask & ~self.occupied()
+        for color, mask in enumerate(self.unjoined_masks()):
+            offset = color * grid.cells
+            for src in iter_bits(mask):
+                for dst in iter_bits(neighbour_masks[src] & empty):
+                    move = (src // width, src % width, dst // width, dst % width)
+                    yield move, State(grid, self.bits ^ (((1 << src) | (1 << dst)) << offset))
+
+    def predecessors(self):
+        # states one legal move away from this one: a piece can be taken back to an empty neighbour
+        # only if it would have been unjoined there, since joined pieces never move
+        grid = self.grid
+        width = grid.width
+        neighbour_masks = grid.neighbour_masks
+        empty = grid.full_mask & ~self.occupied()
+        for color, mask in enumerate(self.color_masks()):
+            offset = color * grid.cells
+            for dst in iter_bits(mask):
+                rest = mask ^ (1 << dst)
+                for src in iter_bits(neighbour_masks[dst] & empty):
+                    if not neighbour_masks[src] & rest:
+                        move = (src // width, src % width, dst // width, dst % width)
+                        yield move, State(grid, self.bits ^ (((1 << src) | (1 << dst)) << offset))
+
+    def goals(self, limit, check=None):
+        # every solved state with the same pieces per color, keeping the pieces that are already joined
+        # (and so can never move) in place; None once there are more than limit of them. a color with more
+        # than limit placements on its own gives None before any layout is combined. check is called before
+        # each color is built and may raise to stop the work
+        grid = self.grid
+        choices = []
+        for mask, unjoined in zip(self.color_masks(), self.unjoined_masks()):
+            if check is not None:
+                check()
+            placements = solved_placements(grid, mask.bit_count(), limit)
+            if placements is None:
+                return None
+            frozen = mask & ~unjoined
+            choices.append([placement for placement in placements if placement & frozen == frozen])
+        goals = []
+        stack = [(0, 0, 0)]
+        while stack:
+            color, occupied, bits = stack.pop()
+            if color == len(choices):
+                goals.append(bits)
+                if len(goals) > limit:
+                    return None
+                continue
+            for placement in choices[color]:
+                if not placement & occupied:
+                    stack.append((color + 1, occupied | placement, bits | placement << (color * grid.cells)))
+        return goals
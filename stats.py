@@ -0,0 +1,75 @@
+from time import perf_counter
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+def no_clock():
+    return 0.0
+
+
+class SearchStats:
+    def __init__(self, timing=False, sample_every=0, observer=None, cancel=None):
+        # timing adds a clock read around every phase, so it is off unless asked for
+        self.timing = timing
+        self.clock = perf_counter if timing else no_clock
+        self.sample_every = sample_every
+        self.observer = observer
+        # an optional threading.Event, checked on every expansion so another thread can stop the search
+        self.cancel = cancel
+        self.reset()
+
+    def reset(self):
+        self.generated = 0
+        self.expanded = 0
+        self.duplicates = 0
+        self.pruned = 0
+        self.frontier = 0
+        self.max_frontier = 0
+        self.visited = 0
+        self.max_visited = 0
+        self.heuristic_calls = 0
+        self.bound = 0
+        self.move_time = 0.0
+        self.win_time = 0.0
+        self.hash_time = 0.0
+        self.started = perf_counter()
+        self.samples = []
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def expand(self, frontier=0, visited=0):
+        if self.cancel is not None and self.cancel.is_set():
+            raise SearchCancelled()
+        self.expanded += 1
+        self.frontier = frontier
+        self.visited = visited
+        if frontier > self.max_frontier:
+            self.max_frontier = frontier
+        if visited > self.max_visited:
+            self.max_visited = visited
+        if self.sample_every and self.expanded % self.sample_every == 0:
+            sample = self.as_dict()
+            self.samples.append(sample)
+            if self.observer is not None:
+                self.observer(sample)
+
+    def as_dict(self):
+        return {
+            "elapsed": perf_counter() - self.started,
+            "generated": self.generated,
+            "expanded": self.expanded,
+            "duplicates": self.duplicates,
+            "pruned": self.pruned,
+            "frontier": self.frontier,
+            "max_frontier": self.max_frontier,
+            "visited": self.visited,
+            "max_visited": self.max_visited,
+            "heuristic_calls": self.heuristic_calls,
+            "bound": self.bound,
+            "move_time": self.move_time,
+            "win_time": self.win_time,
+            "hash_time": self.hash_time,
+        }
@@ -0,0 +1,121 @@
+from functools import lru_cache
+
+
+def symmetry_maps(width, height):
+    # every rotation/reflection that maps the board onto itself, as functions of (row, col)
+    maps = [
+        lambda row, col: (row, col),
+        lambda row, col: (row, width - 1 - col),
+        lambda row, col: (height - 1 - row, col),
+        lambda row, col: (height - 1 - row, width - 1 - col),
+    ]
+    if width == height:
+        maps += [
+            lambda row, col: (col, row),
+            lambda row, col: (col, width - 1 - row),
+            lambda row, col: (width - 1 - col, row),
+            lambda row, col: (width - 1 - col, width - 1 - row),
+        ]
+    return maps
+
+
+@lru_cache(maxsize=None)
+def get_symmetries(width, height):
+    return Symmetries(width, height)
+
+
+class Symmetries:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.cell_maps = []
+        self.inverse_maps = []
+        self.packed = {}
+        for transform in symmetry_maps(width, height):
+            cell_map = []
+            for cell in range(self.cells):
+                row, col = transform(cell // width, cell % width)
+                cell_map.append(row * width + col)
+            inverse_map = [0] * self.cells
+            for cell, image in enumerate(cell_map):
+                inverse_map[image] = cell
+            self.cell_maps.append(cell_map)
+            self.inverse_maps.append(inverse_map)
+
+    def packed_tables(self, colors):
+        # one 256-entry table per byte of a whole packed state, so all of its colors are transformed in one pass
+        tables = self.packed.get(colors)
+        if tables is None:
+            cells = self.cells
+            size = colors * cells
+            tables = []
+            for cell_map in self.cell_maps:
+                images = [color * cells + cell_map[cell] for color in range(colors) for cell in range(cells)]
+                chunks = []
+                for chunk in range(0, size, 8):
+                    table = [0] * 256
+                    for byte in range(1, 256):
+                        low = byte & -byte
+                        bit = chunk + low.bit_length() - 1
+                        table[byte] = table[byte ^ low] | (1 << images[bit] if bit < size else 0)
+                    chunks.append(table)
+                tables.append(chunks)
+            self.packed[colors] = tables
+        return tables
+
+    def canonical(self, masks):
+        # smallest packing over every symmetry, with colors of equal piece count sorted so their labels don't matter
+        cells = self.cells
+        full = (1 << cells) - 1
+        packed = 0
+        layout = []
+        for index, mask in enumerate(masks):
+            packed |= mask << (index * cells)
+            # the piece count above each block makes a plain sort order colors by count, then by mask
+            layout.append((index * cells, mask.bit_count() << cells))
+
+        best = None
+        best_symmetry = 0
+        for symmetry, tables in enumerate(self.packed_tables(len(masks))):
+            key = 0
+            bits = packed
+            for table in tables:
+                if not bits:
+                    break
+                key |= table[bits & 255]
+                bits >>= 8
+            blocks = []
+            for shift, count in layout:
+                blocks.append(key >> shift & full | count)
+            # compared from the top color down, which orders them like the packed ints
+            blocks.sort(reverse=True)
+            if best is None or blocks < best:
+                best = blocks
+                best_symmetry = symmetry
+        key = 0
+        for block in best:
+            key = key << cells | block & full
+        return key, best_symmetry
+
+    def canonical_key(self, masks):
+        return self.canonical(masks)[0]
+
+    def canonical_hash(self, masks):
+        # int hashes fold keys wider than 61 bits onto their low bits, which collides packed boards
+        key = self.canonical(masks)[0]
+        return hash(key.to_bytes((key.bit_length() + 7) // 8, "little"))
+
+    def map_move(self, move, symmetry):
+        # a move of the original board expressed on the board transformed by symmetry
+        return self.apply_map(move, self.cell_maps[symmetry])
+
+    def unmap_move(self, move, symmetry):
+        # a move of the transformed board translated back to the original orientation
+        return self.apply_map(move, self.inverse_maps[symmetry])
+
+    def apply_map(self, move, cell_map):
+        width = self.width
+        src = cell_map[move[0] * width + move[1]]
+        dst = cell_map[move[2] * width + move[3]]
+        return src // width, src % width, dst // width, dst % width
@@ -0,0 +1,22 @@
+import unittest
+
+from constants import BLUE, RED
+from piece import Piece
+from puzzle import Puzzle
+from solver import Solver
+from state import get_grid, solved_placements
+
+
+class SolvedPlacementsTest(unittest.TestCase):
+    def test_lone_piece_is_never_solved(self):
+        self.assertEqual(solved_placements(get_grid(3, 3, ()), 1), frozenset())
+
+    def test_bidirectional_does_not_join_a_lone_piece(self):
+        # the red piece can never be joined, so there is no solution to find
+        puzzle = Puzzle(3, 3, [Piece(BLUE, 0, 0), Piece(BLUE, 2, 2), Piece(RED, 1, 1)])
+        for mode in ("bidirectional", "bfs", "a_star"):
+            self.assertIsNone(Solver(puzzle, prune=False).solve(mode), mode)
+
+
+if __name__ == "__main__":
+    unittest.main()
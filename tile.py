@@ -1,15 +1,32 @@
+from functools import lru_cache
+
 import pygame
 
-from constants import CELL_SIZE, TILE_SIZE, BLACK, CREAM
+from constants import CELL_SIZE, TILE_SIZE, BLACK, CREAM, YELLOW
+
+
+@lru_cache(maxsize=None)
+def cell_surface(tile_color, piece_color):
+    # one pre-rendered surface per (tile, piece) color pair, so drawing a cell is a single blit
+    surface = pygame.Surface((CELL_SIZE, CELL_SIZE))
+    surface.fill(BLACK)
+    rect = pygame.Rect(1, 1, TILE_SIZE - 2, TILE_SIZE - 2)
+    pygame.draw.rect(surface, tile_color, rect)
+    pygame.draw.rect(surface, BLACK, rect, 1)
+    if piece_color is not None:
+        pygame.draw.rect(surface, piece_color, (0, 0, TILE_SIZE - 2, TILE_SIZE - 2))
+    return surface
+
 
 class Tile:
     def __init__(self, row, col):
         self.row = row
         self.col = col
-        self.has_piece = False
         self.color = CREAM
         self.tile_rect = pygame.Rect(col * CELL_SIZE + 1, row * CELL_SIZE + 1, TILE_SIZE - 2, TILE_SIZE - 2)
+        self.cell_rect = pygame.Rect(col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
 
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.tile_rect)
-        pygame.draw.rect(surface, BLACK, self.tile_rect, 1)
+    def draw(self, surface, piece=None, highlighted=False):
+        color = YELLOW if highlighted else self.color
+        surface.blit(cell_surface(color, None if piece is None else piece.color), self.cell_rect)
+        return self.cell_rect
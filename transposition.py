@@ -0,0 +1,62 @@
+import random
+from functools import lru_cache
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+@lru_cache(maxsize=None)
+def zobrist_key(color, row, col):
+    # seeded from the square itself so every board and process agrees on the keys
+    return random.Random("%s:%d:%d" % (color, row, col)).getrandbits(64)
+
+
+def zobrist_hash(pieces):
+    key = 0
+    for piece in pieces:
+        key ^= zobrist_key(piece.color, piece.row, piece.col)
+    return key
+
+
+class TranspositionTable:
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.entries = [None] * size
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        # entries from earlier turns stay usable but are the first to be replaced
+        self.age += 1
+
+    def probe(self, key):
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is not None:
+            # depth-preferred: keep a deeper result from the current search
+            if entry[5] == self.age and entry[1] > depth:
+                return
+            if entry[0] != key:
+                self.replacements += 1
+        self.entries[index] = (key, depth, value, bound, move, self.age)
+        self.stores += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0